@@ -7,3 +7,13 @@ BASE_DIR = Path(__file__).resolve().parent
 # Allow overriding paths via environment variables for portability
 DATA_PATH = Path(os.getenv("INVENTORY_DATA_PATH", BASE_DIR / "data"))
 REPORTS_PATH = Path(os.getenv("INVENTORY_REPORTS_PATH", BASE_DIR / "reports"))
+
+# Cleaned inventories are cached here, keyed by source file mtime/size
+CACHE_PATH = Path(os.getenv("INVENTORY_CACHE_PATH", DATA_PATH / ".cache"))
+
+# Worker processes for the analysis endpoints (0 runs them in the server's threadpool).
+# Each worker imports pandas and keeps its own cached frames, so keep this small
+ANALYSIS_WORKERS = int(os.getenv("INVENTORY_ANALYSIS_WORKERS", "2"))
+
+# Re-check template files for changes on every render; set to 0 in production
+TEMPLATES_AUTO_RELOAD = os.getenv("INVENTORY_TEMPLATES_AUTO_RELOAD", "1") != "0"
@@ -1,9 +1,14 @@
+import hashlib
 import os
-from typing import Dict, List, Tuple
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Tuple
 
+import numpy as np
 import pandas as pd
 
-from config import DATA_PATH
+from config import CACHE_PATH, DATA_PATH
 from scripts import data_clean, data_load
 from scripts.data_load import SUPPORTED_EXTENSIONS
 
@@ -11,27 +16,117 @@ from scripts.data_load import SUPPORTED_EXTENSIONS
 DEFAULT_BASE_NAME = os.getenv("INVENTORY_BASE_NAME", "inventario")
 
 
-def load_clean_inventory(base_name: str = DEFAULT_BASE_NAME) -> pd.DataFrame:
+def code_version(*files: str) -> str:
     """
-    Load and clean the inventory using existing loaders to avoid duplicating logic.
+    Short hash of the given source files plus the pandas version.
+    Used in disk cache keys so a deploy that changes the code (or pandas) misses the old entries.
+    """
+    digest = hashlib.sha1(pd.__version__.encode())
+    for file in files:
+        digest.update(Path(file).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+# Versión del código de carga/limpieza que contiene cada pickle de la cache
+CLEAN_CACHE_VERSION = code_version(data_load.__file__, data_clean.__file__)
+
+# Cortes de participacion acumulada para la clasificacion ABC
+_UMBRALES_ABC = np.array([0.80, 0.95])
+_CLASES_ABC = np.array(["A", "B", "C"])
+
+# Cortes de impacto relativo para la severidad de las alertas
+_UMBRALES_SEVERIDAD = np.array([0.02, 0.05])
+_SEVERIDADES = np.array(["Baja", "Media", "Alta"])
+
+
+def resolve_inventory_path(base_name: str = DEFAULT_BASE_NAME) -> str:
+    """
+    Resolve the data file the analysis endpoints read for base_name.
     """
     base_path = DATA_PATH / base_name
 
     # Permitir que base_name se pase con o sin extensión
     if base_path.suffix.lower() in SUPPORTED_EXTENSIONS:
-        actual_path = base_path
-    else:
-        actual_path = data_load.find_actual_file_path(str(base_path))
+        return str(base_path)
+    return data_load.find_actual_file_path(str(base_path))
 
-    df_raw = data_load.load_data(actual_path)
-    return data_clean.data_clean(df_raw)
+
+def load_clean_inventory(base_name: str = DEFAULT_BASE_NAME) -> pd.DataFrame:
+    """
+    Load and clean the inventory using existing loaders to avoid duplicating logic.
+    """
+    return load_clean_file(resolve_inventory_path(base_name))
+
+
+def load_clean_file(actual_path: str) -> pd.DataFrame:
+    """
+    Load and clean an already resolved data file through the in-memory/pickle cache.
+    """
+    try:
+        stat = Path(actual_path).stat()
+    except FileNotFoundError:
+        # load_data resuelve extensiones alternativas y reporta el error original
+        return data_clean.data_clean(data_load.load_data(actual_path))
+
+    df = _load_clean_cached(str(actual_path), stat.st_mtime_ns, stat.st_size)
+    # Copia superficial: quien llama puede agregar columnas sin tocar la cache
+    return df.copy(deep=False)
+
+
+def clear_inventory_cache() -> None:
+    """
+    Drop the in-memory cleaned frames (e.g. after a new upload replaces the source).
+    """
+    _load_clean_cached.cache_clear()
+
+
+@lru_cache(maxsize=4)
+def _load_clean_cached(actual_path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """
+    Serve the cleaned inventory from the pickle cache, rebuilding it when the source changes.
+    """
+    source = Path(actual_path)
+    cache_file = CACHE_PATH / f"{source.name}-{mtime_ns}-{size}-{CLEAN_CACHE_VERSION}.pkl"
+    try:
+        return pd.read_pickle(cache_file)
+    except FileNotFoundError:
+        pass
+
+    df_raw = data_load.load_data(source)
+    df = data_clean.data_clean(df_raw)
+    write_cache_file(cache_file, f"{source.name}-*.pkl", df.to_pickle)
+    return df
+
+
+def write_cache_file(target: Path, stale_pattern: str, write: Callable[[Path], None]) -> None:
+    """
+    Write a disk cache entry atomically and drop its stale siblings (glob stale_pattern).
+    The cache is optional: any OSError only costs a future miss.
+    """
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        for stale in target.parent.glob(stale_pattern):
+            if stale != target:
+                stale.unlink(missing_ok=True)
+        # Temporal propio por escritor: escritores concurrentes no se pisan entre sí
+        with tempfile.NamedTemporaryFile(dir=target.parent, suffix=".tmp", delete=False) as tmp:
+            tmp_file = Path(tmp.name)
+        try:
+            write(tmp_file)
+            os.replace(tmp_file, target)
+        finally:
+            tmp_file.unlink(missing_ok=True)
+    except OSError:
+        # Carrera perdida o disco no escribible: el dato ya está en memoria
+        pass
 
 
 def _ensure_value_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
     Normalize numeric columns and ensure valor_total exists for downstream metrics.
     """
-    work = df.copy()
+    # Copia superficial: solo se reemplazan columnas numéricas; el resto se comparte
+    work = df.copy(deep=False)
     work["cantidad"] = pd.to_numeric(work["cantidad"], errors="coerce").fillna(0)
     work["precio"] = pd.to_numeric(work["precio"], errors="coerce").fillna(0.0)
     if "valor_total" not in work.columns:
@@ -40,12 +135,13 @@ def _ensure_value_columns(df: pd.DataFrame) -> pd.DataFrame:
     return work
 
 
-def abc_classification(df: pd.DataFrame) -> Dict[str, object]:
+def abc_classification(df: pd.DataFrame, as_records: bool = True) -> Dict[str, object]:
     """
     ABC classification based on contribution to total inventory value.
     A: up to 80% of cumulative value
     B: next 15%
     C: remaining items
+    With as_records=False, detalle is returned as a DataFrame instead of a list of dicts.
     """
     work = _ensure_value_columns(df)
     work = work.sort_values("valor_total", ascending=False).reset_index(drop=True)
@@ -57,14 +153,9 @@ def abc_classification(df: pd.DataFrame) -> Dict[str, object]:
     work["participacion"] = work["valor_total"] / total_valor
     work["participacion_acum"] = work["participacion"].cumsum()
 
-    def _asignar_clase(acumulado: float) -> str:
-        if acumulado <= 0.80:
-            return "A"
-        if acumulado <= 0.95:
-            return "B"
-        return "C"
-
-    work["clase_abc"] = work["participacion_acum"].apply(_asignar_clase)
+    # side="left" mantiene los limites inclusivos (<= 80% -> A, <= 95% -> B)
+    acum = work["participacion_acum"].to_numpy()
+    work["clase_abc"] = _CLASES_ABC[np.searchsorted(_UMBRALES_ABC, acum, side="left")]
     capital_a_pct = (
         work.loc[work["clase_abc"] == "A", "valor_total"].sum() / total_valor
     )
@@ -81,7 +172,9 @@ def abc_classification(df: pd.DataFrame) -> Dict[str, object]:
             "participacion_acum",
             "clase_abc",
         ]
-    ].to_dict(orient="records")
+    ]
+    if as_records:
+        detalle = detalle.to_dict(orient="records")
 
     return {
         "detalle": detalle,
@@ -115,85 +208,113 @@ def _rotation_series(df: pd.DataFrame) -> Tuple[pd.Series, str]:
     return serie, note
 
 
-def generar_alertas(df: pd.DataFrame, top_n: int = 10) -> Dict[str, object]:
+def _alert_frame(
+    work: pd.DataFrame,
+    mask: pd.Series,
+    total_valor: float,
+    tipo: str,
+) -> pd.DataFrame:
+    """
+    Build the alert rows of one type for the products selected by mask.
+    The detalle text is filled in by generar_alertas once the top N is known.
+    """
+    seleccion = work.loc[mask]
+    valor = seleccion["valor_total"].astype(float)
+    impacto_relativo = (valor / total_valor) if total_valor else valor * 0
+    severidad = _SEVERIDADES[
+        np.searchsorted(_UMBRALES_SEVERIDAD, impacto_relativo.to_numpy(), side="right")
+    ]
+
+    frame = pd.DataFrame(
+        {
+            "codigo": seleccion["codigo"],
+            "nombre": seleccion["nombre"],
+            "categoria": seleccion["categoria"],
+            "cantidad": seleccion["cantidad"].astype(int),
+            "precio": seleccion["precio"].astype(float),
+            "valor_total": valor,
+            "impacto_relativo": impacto_relativo,
+            "severidad": severidad,
+            "tipo": tipo,
+            "detalle": "",
+            "prioridad_valor": valor,
+            "recomendacion": "Recomendacion: reducir stock gradualmente o revisar rotacion segun contexto.",
+        },
+        index=seleccion.index,
+    )
+    # Índice por posición de fila en work: orden estable y acceso directo a arrays
+    frame.index = np.flatnonzero(mask.to_numpy())
+    return frame
+
+
+def generar_alertas(
+    df: pd.DataFrame,
+    top_n: int = 10,
+    as_records: bool = True,
+) -> Dict[str, object]:
     """
     Produce automatic alerts based on stock percentiles and immobilized capital.
+    With as_records=False, alertas is returned as a DataFrame instead of a list of dicts.
     """
     work = _ensure_value_columns(df)
     if work.empty:
         return {"alertas": [], "umbrales": {}, "supuesto_capital_muerto": ""}
 
-    q25 = work["cantidad"].quantile(0.25)
-    q75 = work["cantidad"].quantile(0.75)
-    valor_q75 = work["valor_total"].quantile(0.75)
+    # Columnas ya sin NaN: np.quantile equivale a Series.quantile con una sola pasada
+    q25, q75 = np.quantile(work["cantidad"].to_numpy(), [0.25, 0.75])
+    valor_q75 = np.quantile(work["valor_total"].to_numpy(), 0.75)
     total_valor = work["valor_total"].sum()
 
     rotacion, rotacion_nota = _rotation_series(work)
-    rotacion_q25 = rotacion.quantile(0.25)
-
-    alertas: List[Dict[str, object]] = []
+    rotacion_q25 = np.quantile(rotacion.to_numpy(), 0.25)
 
-    def _base_alert(row: pd.Series, tipo: str, detalle: str) -> Dict[str, object]:
-        valor = float(row.get("valor_total", 0.0))
-        impacto_relativo = (valor / total_valor) if total_valor else 0
-        if impacto_relativo >= 0.05:
-            severidad = "Alta"
-        elif impacto_relativo >= 0.02:
-            severidad = "Media"
-        else:
-            severidad = "Baja"
+    mask_sobre = work["cantidad"] > q75
+    mask_quiebre = work["cantidad"] < q25
+    mask_muerto = (work["valor_total"] >= valor_q75) & (rotacion <= rotacion_q25)
 
-        return {
-            "codigo": row.get("codigo"),
-            "nombre": row.get("nombre"),
-            "categoria": row.get("categoria"),
-            "cantidad": int(row.get("cantidad", 0)),
-            "precio": float(row.get("precio", 0.0)),
-            "valor_total": valor,
-            "impacto_relativo": impacto_relativo,
-            "severidad": severidad,
-            "tipo": tipo,
-            "detalle": detalle,
-            "prioridad_valor": float(row.get("valor_total", 0.0)),
-            "recomendacion": "Recomendacion: reducir stock gradualmente o revisar rotacion segun contexto.",
-        }
+    bloques = [
+        _alert_frame(work, mask_sobre, total_valor, "SOBRE_STOCK"),
+        _alert_frame(work, mask_quiebre, total_valor, "RIESGO_QUIEBRE"),
+        _alert_frame(work, mask_muerto, total_valor, "CAPITAL_MUERTO"),
+    ]
 
-    for idx, row in work.iterrows():
-        cantidad = row["cantidad"]
-        valor = row["valor_total"]
-        rot = rotacion.iloc[idx]
-
-        if cantidad > q75:
-            alertas.append(
-                _base_alert(
-                    row,
-                    "SOBRE_STOCK",
-                    f"Stock {cantidad} > P75 ({q75:.1f}).",
-                )
-            )
-
-        if cantidad < q25:
-            alertas.append(
-                _base_alert(
-                    row,
-                    "RIESGO_QUIEBRE",
-                    f"Stock {cantidad} < P25 ({q25:.1f}).",
-                )
-            )
-
-        if valor >= valor_q75 and rot <= rotacion_q25:
-            alertas.append(
-                _base_alert(
-                    row,
-                    "CAPITAL_MUERTO",
-                    (
-                        f"Valor alto >= P75 ({valor_q75:.2f}) con rotacion baja "
-                        f"<= P25 ({rotacion_q25:.2f}). {rotacion_nota}"
-                    ),
-                )
-            )
-
-    alertas = sorted(alertas, key=lambda x: x["prioridad_valor"], reverse=True)[:top_n]
+    # Ante empates de valor se conserva el orden fila -> tipo
+    alertas_df = pd.concat(bloques).sort_index(kind="stable")
+    if top_n is None:
+        alertas_df = alertas_df.sort_values("prioridad_valor", ascending=False, kind="stable")
+    else:
+        # Selección parcial O(N log k); _desempate fija el orden fila -> tipo
+        alertas_df = (
+            alertas_df.assign(_desempate=-np.arange(len(alertas_df)))
+            .nlargest(top_n, ["prioridad_valor", "_desempate"])
+            .drop(columns="_desempate")
+        )
+
+    # El formateo de texto es lo más caro: solo se hace para las alertas devueltas.
+    # Cantidad como float para que el detalle no cambie si llega como entero
+    cantidad_txt = (
+        work["cantidad"].to_numpy(dtype=float)[alertas_df.index.to_numpy()]
+        .astype(str)
+        .astype(object)
+    )
+    tipos = alertas_df["tipo"].to_numpy()
+    detalle = np.where(
+        tipos == "CAPITAL_MUERTO",
+        (
+            f"Valor alto >= P75 ({valor_q75:.2f}) con rotacion baja "
+            f"<= P25 ({rotacion_q25:.2f}). {rotacion_nota}"
+        ),
+        "Stock "
+        + cantidad_txt
+        + np.where(
+            tipos == "SOBRE_STOCK",
+            f" > P75 ({q75:.1f}).",
+            f" < P25 ({q25:.1f}).",
+        ).astype(object),
+    )
+    alertas = alertas_df.assign(detalle=detalle)
+    if as_records:
+        alertas = alertas.to_dict(orient="records")
 
     return {
         "alertas": alertas,
@@ -213,10 +334,12 @@ def simular_what_if(
     categoria: str,
     porcentaje_reduccion: float,
     top_n: int | None = None,
+    as_records: bool = True,
 ) -> Dict[str, object]:
     """
     Estimate liberated capital after reducing stock of a category by a percentage.
     Optionally limit the action to the top N items by value in that category.
+    With as_records=False, detalle is returned as a DataFrame instead of a list of dicts.
     """
     work = _ensure_value_columns(df)
     categoria_normalizada = categoria.strip().lower()
@@ -236,7 +359,7 @@ def simular_what_if(
         }
 
     if top_n and top_n > 0:
-        target = target.sort_values("valor_total", ascending=False).head(int(top_n))
+        target = target.nlargest(int(top_n), "valor_total")
 
     porcentaje = porcentaje_reduccion
     if porcentaje_reduccion > 1:
@@ -249,7 +372,9 @@ def simular_what_if(
 
     detalle = target[
         ["codigo", "nombre", "categoria", "cantidad", "precio", "valor_total"]
-    ].to_dict(orient="records")
+    ]
+    if as_records:
+        detalle = detalle.to_dict(orient="records")
 
     return {
         "categoria": categoria,
@@ -260,3 +385,18 @@ def simular_what_if(
         "valor_estimado_post": round(valor_post, 2),
         "detalle": detalle,
     }
+
+
+def run_analysis(name: str, actual_path: str, **kwargs) -> Dict[str, object]:
+    """
+    Load the cached inventory at actual_path and run one analysis by name.
+    Entry point for worker processes: only the name, path and parameters are pickled,
+    not the frame. The caller resolves the path, so workers never rely on their own
+    memoized path resolution.
+    """
+    analyses = {
+        "abc": abc_classification,
+        "alerts": generar_alertas,
+        "what_if": simular_what_if,
+    }
+    return analyses[name](load_clean_file(actual_path), **kwargs)
@@ -1,35 +1,58 @@
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import matplotlib
 import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+from pandas.api.types import CategoricalDtype
 
 from config import REPORTS_PATH
 
+# Render sin GUI; las figuras se crean con la API orientada a objetos (sin pyplot),
+# así no quedan registradas en el estado global y son seguras entre hilos
+matplotlib.use("Agg")
+
+# Configuración manual de estilo (una sola vez, común a todos los gráficos)
+matplotlib.rcParams.update(
+    {
+        "axes.facecolor": "white",
+        "axes.edgecolor": "0.3",
+        "axes.grid": True,
+        "grid.alpha": 0.3,
+        "grid.linestyle": ":",
+        "font.family": "sans-serif",
+    }
+)
+
 
-def analizar_inventario(df: pd.DataFrame) -> None:
+def analizar_inventario(df: pd.DataFrame, verbose: bool = False) -> None:
     """
     Análisis principal para columnas:
     codigo, nombre, cantidad, precio, categoria, ubicacion, valor_total
+
+    Los reportes de consola (to_string de cada tabla) solo se generan con
+    verbose=True; los gráficos se generan siempre.
     """
-    print("\n=== ANÁLISIS AVANZADO DE INVENTARIO ===")
+    if verbose:
+        print("\n=== ANÁLISIS AVANZADO DE INVENTARIO ===")
 
-    # --- Análisis de Stock ---
-    print("\n--- Análisis de Stock ---")
-    stock_bajo(df, umbral=10)
-    stock_excesivo(df, umbral=100)
-    promedio_stock_categoria(df)
-    productos_sin_stock(df)
+        # --- Análisis de Stock ---
+        print("\n--- Análisis de Stock ---")
+        stock_bajo(df, umbral=10)
+        stock_excesivo(df, umbral=100)
+        promedio_stock_categoria(df)
+        productos_sin_stock(df)
 
-    # --- Análisis Económico ---
-    print("\n--- Análisis Económico ---")
-    valor_total_categoria(df)
-    productos_mas_costosos(df, n=5)
-    valor_min_max(df)
+        # --- Análisis Económico ---
+        print("\n--- Análisis Económico ---")
+        valor_total_categoria(df)
+        productos_mas_costosos(df, n=5)
+        valor_min_max(df)
 
-    # --- Visualizaciones ---
-    print("\n--- Visualizaciones ---")
-    grafico_distribucion_stock(df)
-    grafico_valor_categoria(df)
+        # --- Visualizaciones ---
+        print("\n--- Visualizaciones ---")
+    grafico_distribucion_stock(df, verbose=verbose)
+    grafico_valor_categoria(df, verbose=verbose)
 
 
 # ========== FUNCIONES DE ANÁLISIS ==========
@@ -46,7 +69,7 @@ def stock_excesivo(df: pd.DataFrame, umbral: int) -> None:
 
 
 def promedio_stock_categoria(df: pd.DataFrame) -> None:
-    promedio = df.groupby("categoria")["cantidad"].mean().round(1)
+    promedio = df.groupby("categoria", observed=True)["cantidad"].mean().round(1)
     print("\nPromedio de unidades por categoría:")
     print(promedio.to_string())
 
@@ -63,7 +86,7 @@ def productos_sin_stock(df: pd.DataFrame) -> None:
 def valor_total_categoria(df: pd.DataFrame) -> None:
     if "valor_total" not in df.columns:
         df["valor_total"] = df["cantidad"] * df["precio"]
-    total = df.groupby("categoria")["valor_total"].sum()
+    total = df.groupby("categoria", observed=True)["valor_total"].sum()
     print("\nValor total del inventario por categoría:")
     print(total.to_string())
 
@@ -92,12 +115,10 @@ def valor_min_max(df: pd.DataFrame) -> None:
 
 
 # ========== VISUALIZACIONES ==========
-def grafico_distribucion_stock(df: pd.DataFrame) -> None:
+def grafico_distribucion_stock(df: pd.DataFrame, verbose: bool = False) -> None:
     """
     Histograma de distribución de stock con configuración auto-contenida.
     """
-    plt.figure(figsize=(12, 7), dpi=120, facecolor="white")
-
     # Limpieza de datos robusta
     df = df.copy()
     df["cantidad"] = pd.to_numeric(df["cantidad"], errors="coerce")
@@ -107,21 +128,12 @@ def grafico_distribucion_stock(df: pd.DataFrame) -> None:
         print("⚠ Datos insuficientes para generar histograma de stock (0 registros válidos).")
         return
 
-    # Configuración manual de estilo
-    plt.rcParams.update(
-        {
-            "axes.facecolor": "white",
-            "axes.edgecolor": "0.3",
-            "axes.grid": True,
-            "grid.alpha": 0.3,
-            "grid.linestyle": ":",
-            "font.family": "sans-serif",
-        }
-    )
+    fig = Figure(figsize=(12, 7), dpi=120, facecolor="white")
+    ax = fig.subplots()
 
     # Histograma
     n_bins = min(15, len(datos.unique()))
-    plt.hist(
+    ax.hist(
         datos,
         bins=n_bins,
         color="#3498db",
@@ -134,14 +146,14 @@ def grafico_distribucion_stock(df: pd.DataFrame) -> None:
     mediana = datos.median()
     q75 = datos.quantile(0.75)
 
-    plt.axvline(
+    ax.axvline(
         mediana,
         color="#e74c3c",
         linestyle="--",
         linewidth=1.5,
         label=f"Mediana ({mediana:.0f} uds)",
     )
-    plt.axvline(
+    ax.axvline(
         q75,
         color="#f39c12",
         linestyle=":",
@@ -149,34 +161,32 @@ def grafico_distribucion_stock(df: pd.DataFrame) -> None:
         label=f"75% Percentil ({q75:.0f} uds)",
     )
 
-    plt.title(
+    ax.set_title(
         "Distribución de Stock\nAnálisis Cuantitativo",
         fontsize=14,
         pad=20,
         color="#2c3e50",
         fontweight="bold",
     )
-    plt.xlabel("Unidades en Stock", fontsize=12, labelpad=10, color="#2c3e50")
-    plt.ylabel("Número de Productos", fontsize=12, labelpad=10, color="#2c3e50")
+    ax.set_xlabel("Unidades en Stock", fontsize=12, labelpad=10, color="#2c3e50")
+    ax.set_ylabel("Número de Productos", fontsize=12, labelpad=10, color="#2c3e50")
 
-    legend = plt.legend(frameon=True, facecolor="white")
+    legend = ax.legend(frameon=True, facecolor="white")
     for text in legend.get_texts():
         text.set_color("#2c3e50")
 
     REPORTS_PATH.mkdir(parents=True, exist_ok=True)
     filepath = REPORTS_PATH / "stock_analizado_confiable.png"
-    plt.savefig(filepath, bbox_inches="tight", dpi=300)
-    plt.close()
+    fig.savefig(filepath, bbox_inches="tight", dpi=300)
 
-    print(f"✅ Gráfico generado en:\n{filepath.absolute()}")
+    if verbose:
+        print(f"✅ Gráfico generado en:\n{filepath.absolute()}")
 
 
-def grafico_valor_categoria(df: pd.DataFrame) -> None:
+def grafico_valor_categoria(df: pd.DataFrame, verbose: bool = False) -> None:
     """
     Barras horizontales con valor total por categoría, filtrando valores inválidos.
     """
-    plt.figure(figsize=(12, 7), dpi=120)
-
     df = df.copy()
     df["precio"] = pd.to_numeric(df["precio"], errors="coerce").fillna(0)
     df["cantidad"] = pd.to_numeric(df["cantidad"], errors="coerce").fillna(0)
@@ -193,22 +203,24 @@ def grafico_valor_categoria(df: pd.DataFrame) -> None:
         "Fontanería",
     }
 
-    df["categoria"] = (
-        df["categoria"]
-        .astype(str)
-        .str.strip()
-        .apply(lambda x: x if x in categorias_validas else "Otros")
+    categorias = df["categoria"].astype(str).str.strip()
+    categorias = categorias.where(categorias.isin(categorias_validas), "Otros")
+    df["categoria"] = categorias.astype(
+        CategoricalDtype(sorted(categorias_validas) + ["Otros"])
     )
 
     datos = (
-        df.groupby("categoria")["valor_total"]
+        df.groupby("categoria", observed=True)["valor_total"]
         .sum()
         .sort_values()
         .loc[lambda x: x > 0]
     )
 
-    ax = datos.plot(
+    fig = Figure(figsize=(12, 7), dpi=120)
+    ax = fig.subplots()
+    datos.plot(
         kind="barh",
+        ax=ax,
         color="#2ca02c",
         edgecolor="white",
         alpha=0.8,
@@ -216,7 +228,7 @@ def grafico_valor_categoria(df: pd.DataFrame) -> None:
     )
 
     ax.xaxis.set_major_formatter(
-        plt.FuncFormatter(
+        FuncFormatter(
             lambda x, _: f"${x / 1000:,.1f}K"
             .replace(",", "X")
             .replace(".", ",")
@@ -224,13 +236,13 @@ def grafico_valor_categoria(df: pd.DataFrame) -> None:
         )
     )
 
-    plt.title("Valor Real por Categoría (miles USD)", pad=20, fontweight="bold")
-    plt.xlabel("Valor Total (USD)", labelpad=10)
-    plt.grid(axis="x", linestyle=":", alpha=0.3)
-    plt.tight_layout()
+    ax.set_title("Valor Real por Categoría (miles USD)", pad=20, fontweight="bold")
+    ax.set_xlabel("Valor Total (USD)", labelpad=10)
+    ax.grid(axis="x", linestyle=":", alpha=0.3)
+    fig.tight_layout()
 
     filepath = REPORTS_PATH / "valor_categoria_real.png"
-    plt.savefig(filepath, bbox_inches="tight", dpi=300, facecolor="white")
-    plt.close()
+    fig.savefig(filepath, bbox_inches="tight", dpi=300, facecolor="white")
 
-    print(f"✅ Gráfico de categorías guardado en: {filepath.absolute()}")
+    if verbose:
+        print(f"✅ Gráfico de categorías guardado en: {filepath.absolute()}")
@@ -8,7 +8,8 @@ def data_clean(df: pd.DataFrame) -> pd.DataFrame:
     - Formateo consistente de decimales
     - Filtrado robusto de filas inválidas
     """
-    df_clean = df.copy()
+    # Copia superficial: cada paso reemplaza columnas completas, nunca muta df
+    df_clean = df.copy(deep=False)
 
     required_cols = {"codigo", "nombre", "categoria", "ubicacion", "cantidad", "precio"}
     missing = required_cols - set(df_clean.columns)
@@ -22,25 +23,19 @@ def data_clean(df: pd.DataFrame) -> pd.DataFrame:
             df_clean["categoria"].isna()
             | df_clean["categoria"].astype(str).str.strip().str.lower().isin(["", "nan"])
         )
-        df_clean = df_clean[~mask_invalid_cat].copy()
+        df_clean = df_clean.loc[~mask_invalid_cat]
 
     # 1. Limpieza básica (strings)
     for col in ["codigo", "nombre", "categoria", "ubicacion"]:
         df_clean[col] = df_clean[col].astype(str).str.strip()
 
     # 2. Normalización crítica de códigos (PR + 3-4 dígitos)
-    df_clean["codigo"] = (
-        df_clean["codigo"]
-        .str.upper()
-        .str.extract(r"(PR?\s?(\d{3,4}))")[0]  # Captura PR + 3-4 dígitos
-        .str.replace(r"\D", "", regex=True)  # Elimina caracteres no numéricos
-        .apply(lambda x: f"PR{x.zfill(3)}" if pd.notna(x) and x.isdigit() else pd.NA)
-    )
-
-    # 3. Filtrado de filas sin código válido
-    df_clean = df_clean.dropna(subset=["codigo"])
+    digitos = df_clean["codigo"].str.upper().str.extract(
+        r"PR?\s?(\d{3,4})", expand=False
+    )  # Captura solo los 3-4 dígitos tras PR
+    df_clean["codigo"] = "PR" + digitos.str.zfill(3)  # sin coincidencia -> NaN
 
-    # 4. Limpieza numérica con control estricto
+    # 3. Limpieza numérica con control estricto
     df_clean["cantidad"] = (
         pd.to_numeric(df_clean["cantidad"], errors="coerce").fillna(0).round(2)
     )  # mantener signo y decimales para no subestimar stock
@@ -48,23 +43,34 @@ def data_clean(df: pd.DataFrame) -> pd.DataFrame:
         pd.to_numeric(df_clean["precio"], errors="coerce").round(2)
     )  # mantener signo para descartar negativos
 
-    # 5. Cálculo preciso de valor_total
+    # 4. Cálculo preciso de valor_total
     df_clean["valor_total"] = (df_clean["cantidad"] * df_clean["precio"]).round(2)
 
-    # 6. Filtrado final (asegura todas las columnas clave)
-    df_clean = df_clean[
-        (df_clean["cantidad"] >= 0)  # permitir agotados
+    # 5. Filtrado final en una sola máscara (código válido + columnas clave)
+    mask_validos = (
+        df_clean["codigo"].notna()
+        & (df_clean["cantidad"] >= 0)  # permitir agotados
         & (df_clean["precio"] > 0)
         & (df_clean["nombre"].str.len() > 3)
-    ].drop_duplicates()  # elimina solo filas idénticas, preserva ubicaciones distintas
+    )
+    df_clean = (
+        df_clean.loc[mask_validos]
+        .drop_duplicates()  # elimina solo filas idénticas, preserva ubicaciones distintas
+        .sort_values("codigo", ignore_index=True)  # 6. Ordenamiento por código
+    )
+
+    # 7. Stock entero -> menor tipo sin signo (si hay decimales se conserva float64).
+    # precio y valor_total quedan en float64: float32 pierde centavos en montos grandes
+    df_clean["cantidad"] = pd.to_numeric(df_clean["cantidad"], downcast="unsigned")
 
-    # 7. Ordenamiento por código
-    df_clean = df_clean.sort_values("codigo").reset_index(drop=True)
+    # 8. Texto repetido de baja cardinalidad -> category (códigos enteros + K etiquetas)
+    for col in ("categoria", "ubicacion"):
+        df_clean[col] = df_clean[col].astype("category")
 
     # Reporte
     print("\n=== REPORTE FINAL ===")
     print(f"Registros válidos: {len(df_clean)}")
-    print(f"Valor total: ${df_clean['valor_total'].sum():,.2f}")
+    print(f"Valor total: ${df_clean['valor_total'].to_numpy().sum():,.2f}")
     print("\n5 primeros registros:")
     print(df_clean.head().to_string(index=False))
 
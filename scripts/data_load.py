@@ -1,10 +1,18 @@
+from functools import lru_cache
+from importlib.util import find_spec
 from pathlib import Path
 from typing import Union
 
+import numpy as np
 import pandas as pd
 
 SUPPORTED_EXTENSIONS = [".csv", ".xlsx", ".ods"]
 
+# Motores opcionales más rápidos; si no están instalados se usan los de siempre
+CSV_ENGINE = "pyarrow" if find_spec("pyarrow") else "c"
+XLSX_ENGINE = "calamine" if find_spec("python_calamine") else "openpyxl"
+ODS_ENGINE = "calamine" if find_spec("python_calamine") else "odf"
+
 
 def load_data(file_path: Union[str, Path], try_alternatives: bool = True) -> pd.DataFrame:
     """
@@ -61,11 +69,11 @@ def load_data(file_path: Union[str, Path], try_alternatives: bool = True) -> pd.
         # Cargar según extensión
         file_ext = file_path.suffix.lower()
         if file_ext == ".csv":
-            df = pd.read_csv(file_path)
+            df = _read_csv(file_path)
         elif file_ext == ".xlsx":
-            df = pd.read_excel(file_path, engine="openpyxl")
+            df = pd.read_excel(file_path, engine=XLSX_ENGINE)
         elif file_ext == ".ods":
-            df = pd.read_excel(file_path, engine="odf")
+            df = pd.read_excel(file_path, engine=ODS_ENGINE)
         else:
             raise ValueError(f"Extensión no manejada: {file_ext}")
 
@@ -82,10 +90,40 @@ def load_data(file_path: Union[str, Path], try_alternatives: bool = True) -> pd.
         raise Exception(f"Error al cargar {file_path}: {str(e)}")
 
 
+def _read_csv(file_path: Path) -> pd.DataFrame:
+    if CSV_ENGINE == "pyarrow":
+        try:
+            # pyarrow deja None en columnas de texto; data_clean espera NaN
+            df = pd.read_csv(file_path, engine="pyarrow").fillna(np.nan)
+        except ValueError:
+            # pyarrow rechaza CSV que el motor C sí lee (filas con más o menos
+            # campos) y reporta los vacíos como error de parseo: se repite con
+            # el motor C para conservar su resultado y sus errores
+            pass
+        else:
+            if not _has_bytes_columns(df):
+                return df
+            # Texto que no es UTF-8 (p. ej. CSV de Excel en Windows-1252): pyarrow
+            # lo deja como bytes en vez de fallar; el motor C da el error de siempre
+    return pd.read_csv(file_path)
+
+
+def _has_bytes_columns(df: pd.DataFrame) -> bool:
+    # pyarrow tipa cada columna entera (string o binary): basta el primer valor
+    for column in df.select_dtypes(include="object"):
+        first = df[column].first_valid_index()
+        if first is not None and isinstance(df.at[first, column], bytes):
+            return True
+    return False
+
+
 def find_actual_file_path(base_path: str) -> str:
     """
     Encuentra la ruta real del archivo con cualquier extensión soportada.
 
+    El resultado se memoiza por base_path; solo se vuelve a verificar con un
+    stat que la ruta cacheada siga existiendo (si no, se busca de nuevo).
+
     Args:
         base_path: Ruta base sin extensión (ej. '/ruta/archivo')
 
@@ -95,6 +133,22 @@ def find_actual_file_path(base_path: str) -> str:
     Raises:
         FileNotFoundError: Si no se encuentra ningún archivo compatible
     """
+    cached = _find_actual_file_path_cached(base_path)
+    if Path(cached).exists():
+        return cached
+    clear_file_path_cache()
+    return _find_actual_file_path_cached(base_path)
+
+
+def clear_file_path_cache() -> None:
+    """
+    Invalida las rutas memoizadas (p. ej. al subir un archivo nuevo).
+    """
+    _find_actual_file_path_cached.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def _find_actual_file_path_cached(base_path: str) -> str:
     for ext in SUPPORTED_EXTENSIONS:
         file_path = Path(f"{base_path}{ext}")
         if file_path.exists():
@@ -1,33 +1,174 @@
-import json
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
+from typing import Iterator
+from urllib.parse import parse_qs
 
+import jinja2
+import orjson
 import pandas as pd
-from fastapi import FastAPI, HTTPException, Query, Request, UploadFile
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
 
-from config import DATA_PATH, REPORTS_PATH
+from config import (
+    ANALYSIS_WORKERS,
+    CACHE_PATH,
+    DATA_PATH,
+    REPORTS_PATH,
+    TEMPLATES_AUTO_RELOAD,
+)
 from scripts import business_analysis, data_analysis, data_clean, data_load
 
 MAX_UPLOAD_SIZE_BYTES = 20 * 1024 * 1024  # 20 MB
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # margen para boundaries y cabeceras de las partes
 ALLOWED_EXTENSIONS = {".csv", ".xlsx", ".ods"}
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NDJSON_BATCH_ROWS = 1000  # filas serializadas por cada bloque del stream
 
-app = FastAPI(title="AI Inventory Management")
 
-# Montajes de estáticos
-app.mount("/static", StaticFiles(directory="static"), name="static")
+class _PathSendFileResponse(FileResponse):
+    """
+    FileResponse que, si el servidor ASGI soporta la extensión
+    `http.response.pathsend`, le delega el envío del archivo (sendfile en el
+    kernel, sin copiarlo por Python). Rangos y HEAD siguen el camino normal.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (
+            "http.response.pathsend" not in scope.get("extensions", {})
+            or scope["method"].upper() == "HEAD"
+            or Headers(scope=scope).get("range")
+        ):
+            await super().__call__(scope, receive, send)
+            return
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+        await send({"type": "http.response.pathsend", "path": str(self.path)})
+        if self.background is not None:
+            await self.background()
+
+
+class _StaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        response = _PathSendFileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class _ReportFiles(_StaticFiles):
+    """
+    StaticFiles de /reports: los PNG pedidos con ?v=<st_mtime_ns del archivo> se
+    cachean como inmutables (la URL cambia al regenerarse el gráfico); con otra
+    versión, o sin ella, se revalidan como el resto.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if str(full_path).endswith(".png") and query.get("v") == [str(stat_result.st_mtime_ns)]:
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+def _create_analysis_pool() -> ProcessPoolExecutor:
+    # Los workers se crean con spawn (no fork) porque el servidor ya tiene hilos
+    return ProcessPoolExecutor(
+        max_workers=ANALYSIS_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if ANALYSIS_WORKERS > 0:
+        app.state.analysis_pool = _create_analysis_pool()
+    try:
+        yield
+    finally:
+        pool = getattr(app.state, "analysis_pool", None)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+            app.state.analysis_pool = None
+
+
+app = FastAPI(title="AI Inventory Management", lifespan=lifespan)
+
+# Directorios de trabajo: se crean una sola vez al importar, no en cada subida
+DATA_PATH.mkdir(parents=True, exist_ok=True)
 REPORTS_PATH.mkdir(parents=True, exist_ok=True)
-app.mount("/reports", StaticFiles(directory=str(REPORTS_PATH)), name="reports")
-templates = Jinja2Templates(directory="templates")
 
+# Montajes de estáticos
+app.mount("/static", _StaticFiles(directory="static"), name="static")
+app.mount("/reports", _ReportFiles(directory=str(REPORTS_PATH)), name="reports")
+
+# Bytecode de las plantillas en disco: un worker nuevo no vuelve a compilarlas;
+# trim/lstrip_blocks quitan del HTML el espacio que dejan los bloques {% %}
+_TEMPLATES_CACHE_PATH = CACHE_PATH / "templates"
+_TEMPLATES_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader("templates"),
+        autoescape=True,
+        bytecode_cache=jinja2.FileSystemBytecodeCache(str(_TEMPLATES_CACHE_PATH)),
+        auto_reload=TEMPLATES_AUTO_RELOAD,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+)
+
+# Versión del código que produce los análisis precalculados (ver _precomputed_file)
+_PRECOMPUTED_VERSION = business_analysis.code_version(
+    data_load.__file__, data_clean.__file__, business_analysis.__file__, __file__
+)
+
+# Último latest_summary.json parseado, indexado por (mtime_ns, tamaño)
+_summary_cache: dict = {"key": None, "data": None, "charts": None}
 
-def _load_clean_inventory() -> pd.DataFrame:
+
+async def _run_analysis(request: Request, name: str, source: Path, **kwargs) -> dict:
     """
-    Centraliza la carga/limpieza para reutilizar en los endpoints de analisis.
+    Centraliza la carga/limpieza y el análisis para reutilizar en los endpoints de analisis.
+
+    Con pool de procesos el cálculo escapa al GIL: el worker recarga el
+    inventario desde su cache y solo viaja el resultado, no el DataFrame.
+    La ruta `source` la resuelve siempre el servidor (los workers no ven
+    las invalidaciones que hace upload_file en este proceso).
     """
+    pool = getattr(request.app.state, "analysis_pool", None)
     try:
-        return business_analysis.load_clean_inventory()
+        if pool is None:
+            return await run_in_threadpool(
+                business_analysis.run_analysis, name, str(source), **kwargs
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            pool, partial(business_analysis.run_analysis, name, str(source), **kwargs)
+        )
+    except BrokenProcessPool:
+        # Un worker murió (p. ej. por memoria): el pool queda inutilizable, se
+        # reemplaza para las peticiones siguientes
+        if request.app.state.analysis_pool is pool:
+            request.app.state.analysis_pool = _create_analysis_pool()
+            pool.shutdown(wait=False, cancel_futures=True)
+        raise HTTPException(
+            status_code=500,
+            detail="El proceso de análisis terminó inesperadamente; intenta de nuevo.",
+        )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     except FileNotFoundError as exc:
@@ -39,39 +180,245 @@ def _load_clean_inventory() -> pd.DataFrame:
         )
 
 
-@app.get("/", response_class=HTMLResponse)
-def dashboard(request: Request):
-    charts = [p.name for p in REPORTS_PATH.glob("*.png")] if REPORTS_PATH.exists() else []
+def _frame_records(frame: pd.DataFrame) -> Iterator[dict]:
+    """
+    Filas del DataFrame como dicts de tipos nativos: un tolist() por columna en
+    vez de to_dict por fila, y orjson escribe los floats con el repr más corto
+    que conserva el valor (to_json los fija a N decimales).
+    """
+    columns = [str(column) for column in frame.columns]
+    values = [frame[column].tolist() for column in frame.columns]
+    return (dict(zip(columns, row)) for row in zip(*values))
+
+
+def _frame_to_json(obj: object) -> list:
+    """
+    Convierte los DataFrames del payload en records para _json_response.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return list(_frame_records(obj))
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def _dumps(payload: dict) -> bytes:
+    return orjson.dumps(payload, default=_frame_to_json, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _json_response(payload: dict | bytes) -> Response:
+    """
+    Respuesta JSON serializada con orjson; los DataFrames del payload van como records.
+    """
+    content = payload if isinstance(payload, bytes) else _dumps(payload)
+    return Response(content, media_type="application/json")
+
+
+def _ndjson_lines(payload: dict) -> Iterator[bytes]:
+    """
+    NDJSON: primera línea con los campos escalares del payload y luego una
+    línea por fila de su DataFrame, serializadas por lotes.
+    """
+    frames = [value for value in payload.values() if isinstance(value, pd.DataFrame)]
+    header = {key: value for key, value in payload.items() if not isinstance(value, pd.DataFrame)}
+    yield orjson.dumps(header, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    for frame in frames:
+        for start in range(0, len(frame), NDJSON_BATCH_ROWS):
+            batch = frame.iloc[start : start + NDJSON_BATCH_ROWS]
+            yield b"".join(
+                orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+                for row in _frame_records(batch)
+            )
+
+
+def _current_inventory() -> tuple[Path, os.stat_result]:
+    """
+    Archivo que leen los endpoints de análisis y su stat.
+
+    Raises:
+        FileNotFoundError: Si aún no existe ningún archivo de inventario
+    """
+    source = Path(business_analysis.resolve_inventory_path())
+    return source, source.stat()
+
+
+def _precomputed_file(kind: str, source: Path, st: os.stat_result) -> Path:
+    # Misma clave que la cache de DataFrames (versión del archivo) más la versión
+    # del código que calcula y serializa los análisis
+    version = f"{st.st_mtime_ns}-{st.st_size}-{_PRECOMPUTED_VERSION}"
+    return CACHE_PATH / f"{source.name}-{version}.{kind}.json"
+
+
+def _read_precomputed(kind: str, source: Path, st: os.stat_result) -> bytes | None:
+    """
+    JSON ya serializado en la subida para la versión actual del inventario.
+    """
+    try:
+        return _precomputed_file(kind, source, st).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+async def _analysis_response(
+    request: Request,
+    name: str,
+    precomputed: str | None = None,
+    **kwargs,
+) -> Response:
+    """
+    Respuesta de análisis con ETag por versión del archivo de inventario.
+
+    Si el cliente ya tiene esa versión se responde 304 sin cargar ni serializar
+    nada; si no, se sirve el JSON precalculado (`precomputed`) o se ejecuta
+    business_analysis.run_analysis(name, **kwargs). Con `Accept: application/x-ndjson`
+    las filas se envían como NDJSON a medida que se serializan.
+    """
+    ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+    try:
+        source, st = _current_inventory()
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+    version = f"{st.st_mtime_ns}-{st.st_size}-{_PRECOMPUTED_VERSION}" + ("-ndjson" if ndjson else "")
+    headers = {
+        "ETag": f'W/"{version}"',
+        "Cache-Control": "private, no-cache",  # siempre revalidar: una subida cambia la versión
+        "Vary": "Accept",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if ndjson:
+        payload = await _run_analysis(request, name, source, **kwargs)
+        return StreamingResponse(
+            _ndjson_lines(payload), media_type=NDJSON_MEDIA_TYPE, headers=headers
+        )
+
+    content = None
+    if precomputed:
+        content = await run_in_threadpool(_read_precomputed, precomputed, source, st)
+    if content is None:
+        payload = await _run_analysis(request, name, source, **kwargs)
+        content = await run_in_threadpool(_dumps, payload)
+    response = _json_response(content)
+    response.headers.update(headers)
+    return response
+
+
+def _precompute_analyses(file_path: Path, df: pd.DataFrame) -> None:
+    """
+    Materializa ABC y alertas completas del archivo subido, si es el que sirven
+    los endpoints; así los GET sin parámetros se reducen a leer un archivo.
+    """
+    try:
+        source, st = _current_inventory()
+    except FileNotFoundError:
+        return
+    if source != file_path:
+        return
 
+    resultados = {
+        "abc": business_analysis.abc_classification(df, as_records=False),
+        "alerts": business_analysis.generar_alertas(df, top_n=None, as_records=False),
+    }
+    # Solo es una cache: si no se puede escribir, los GET calculan el análisis
+    for kind, payload in resultados.items():
+        business_analysis.write_cache_file(
+            _precomputed_file(kind, source, st),
+            f"{source.name}-*.{kind}.json",
+            partial(Path.write_bytes, data=_dumps(payload)),
+        )
+
+
+def _scan_charts() -> dict[str, int]:
+    """
+    Gráficos PNG de REPORTS_PATH con su mtime_ns (versión para el ?v= de la URL).
+    """
+    charts: dict[str, int] = {}
+    try:
+        with os.scandir(REPORTS_PATH) as entries:
+            for entry in entries:
+                if entry.name.endswith(".png"):
+                    charts[entry.name] = entry.stat().st_mtime_ns
+    except FileNotFoundError:
+        pass
+    return charts
+
+
+def _load_latest_summary() -> tuple[dict, dict[str, int]]:
+    """
+    KPIs y gráficos del último análisis (un solo stat por página); solo se vuelve
+    a parsear el JSON si el archivo cambió.
+    """
     summary_file = REPORTS_PATH / "latest_summary.json"
-    if summary_file.exists():
-        with open(summary_file, "r", encoding="utf-8") as f:
-            summary = json.load(f)
-    else:
-        summary = {
+    try:
+        st = summary_file.stat()
+    except FileNotFoundError:
+        return {
             "Total Productos": 0,
             "Categorías": 0,
             "Stock Promedio": 0,
             "Valor Total": "$0",
-        }
+        }, {}
 
-    return templates.TemplateResponse(
-        "dashboard.html",
-        {"request": request, "summary": summary, "charts": charts},
-    )
+    key = (st.st_mtime_ns, st.st_size)
+    if _summary_cache["key"] != key:
+        data = orjson.loads(summary_file.read_bytes())
+        charts = data.pop("charts", None)
+        if charts is None:
+            # Resumen anterior sin la lista de gráficos: se escanea REPORTS_PATH
+            # una vez; la próxima subida ya la escribe en el JSON
+            charts = _scan_charts()
+        _summary_cache.update(key=key, data=data, charts=charts)
+    return _summary_cache["data"], _summary_cache["charts"]
 
 
-@app.get("/upload", response_class=HTMLResponse)
-def upload_page(request: Request):
-    return templates.TemplateResponse("upload.html", {"request": request})
+def _build_summary(df: pd.DataFrame) -> dict:
+    """
+    KPIs del dashboard; las reducciones numéricas van directo sobre los arrays NumPy.
+    """
+    total_productos = len(df)
+    cantidad = df["cantidad"].to_numpy()
+    valor_total = df["valor_total"].to_numpy()
+    stock_promedio = cantidad.mean() if total_productos else 0.0
 
+    categoria = df["categoria"]
+    if isinstance(categoria.dtype, pd.CategoricalDtype):
+        # data_clean crea la categoría tras filtrar: todas las categorías están presentes
+        categorias = len(categoria.cat.categories)
+    else:
+        categorias = categoria.nunique()
 
-@app.post("/upload", response_class=HTMLResponse)
-async def upload_file(request: Request, file: UploadFile):
-    DATA_PATH.mkdir(parents=True, exist_ok=True)
-    REPORTS_PATH.mkdir(parents=True, exist_ok=True)
+    return {
+        "Total Productos": total_productos,
+        "Categorías": categorias,
+        "Stock Promedio": round(stock_promedio, 2),
+        "Valor Total": f"${valor_total.sum():,.2f}",
+    }
+
+
+def _write_latest_summary(summary: dict, charts: dict[str, int]) -> None:
+    """
+    Persistencia de los KPIs del dashboard junto con los gráficos generados.
+    """
+    (REPORTS_PATH / "latest_summary.json").write_bytes(
+        orjson.dumps(
+            {**summary, "charts": charts},
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    )
 
-    original_name = file.filename or ""
+
+def _validate_upload_name(original_name: str) -> str:
+    """
+    Nombre seguro (sin rutas) con extensión permitida; HTTP 400 si no lo es.
+    """
     safe_name = Path(original_name).name  # elimina rutas/../
     ext = Path(safe_name).suffix.lower()
 
@@ -82,47 +429,201 @@ async def upload_file(request: Request, file: UploadFile):
             status_code=400,
             detail=f"Extensión no permitida ({ext}). Usa: csv, xlsx u ods.",
         )
+    return safe_name
 
-    raw_bytes = await file.read()
-    if len(raw_bytes) == 0:
-        raise HTTPException(status_code=400, detail="El archivo está vacío.")
-    if len(raw_bytes) > MAX_UPLOAD_SIZE_BYTES:
-        raise HTTPException(
-            status_code=400,
-            detail="El archivo supera el límite de 20 MB.",
-        )
 
+class _StreamedUpload:
+    """
+    Callbacks de MultipartParser que vuelcan el campo `file` a un temporal
+    `.part` de DATA_PATH a medida que llegan los bloques de request.stream(), sin acumular el cuerpo.
+
+    Los callbacks son síncronos: solo encolan los datos en `pending`, que
+    _receive_upload escribe en el threadpool tras cada bloque.
+    """
+
+    def __init__(self) -> None:
+        self.safe_name: str | None = None
+        self.partial_path: Path | None = None
+        self.total_bytes = 0
+        self.pending: list[bytes] = []
+        self._file = None
+        self._receiving = False
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        }
+
+    def _on_part_begin(self) -> None:
+        self._disposition = b""
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        # Solo interesa el primer campo `file`; el resto de partes se ignora
+        if options.get(b"name") != b"file" or self.safe_name is not None:
+            return
+        original_name = options.get(b"filename", b"").decode("utf-8", errors="replace")
+        self.safe_name = _validate_upload_name(original_name)
+        # Temporal propio por subida: dos subidas del mismo nombre no se mezclan
+        self._file = tempfile.NamedTemporaryFile(dir=DATA_PATH, suffix=".part", delete=False)
+        self.partial_path = Path(self._file.name)
+        self._receiving = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._receiving:
+            return
+        self.total_bytes += end - start
+        if self.total_bytes > MAX_UPLOAD_SIZE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail="El archivo supera el límite de 20 MB.",
+            )
+        self.pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._receiving = False
+
+    async def flush(self) -> None:
+        """
+        Escribe lo encolado sin bloquear el event loop.
+        """
+        if self.pending:
+            chunk = b"".join(self.pending)
+            self.pending.clear()
+            await run_in_threadpool(self._file.write, chunk)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self) -> None:
+        """
+        Cierra y borra el temporal si la subida se rechazó o se cortó.
+        """
+        self.close()
+        if self.partial_path is not None:
+            self.partial_path.unlink(missing_ok=True)
+
+
+async def _receive_upload(request: Request) -> _StreamedUpload:
+    """
+    Parsea el multipart bloque a bloque desde request.stream(); el tamaño se
+    controla de forma incremental y un archivo rechazado no deja el temporal.
+    """
+    # Rechazo temprano por Content-Length, antes de leer el cuerpo; sin esa
+    # cabecera (chunked) queda el control incremental de _on_part_data
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Content-Length inválido.")
+        if declared > MAX_UPLOAD_SIZE_BYTES + MULTIPART_OVERHEAD_BYTES:
+            raise HTTPException(status_code=413, detail="El archivo supera el límite de 20 MB.")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Se esperaba un formulario multipart.")
+
+    upload = _StreamedUpload()
+    parser = MultipartParser(params[b"boundary"], upload.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await upload.flush()
+        parser.finalize()
+        await upload.flush()
+        upload.close()
+        if upload.safe_name is None:
+            raise HTTPException(status_code=400, detail="No se recibió ningún archivo.")
+        if upload.total_bytes == 0:
+            raise HTTPException(status_code=400, detail="El archivo está vacío.")
+    except FormParserError as exc:
+        upload.discard()
+        raise HTTPException(status_code=400, detail=f"Formulario multipart inválido: {exc}")
+    except BaseException:
+        upload.discard()
+        raise
+    return upload
+
+
+@app.get("/", response_class=HTMLResponse)
+def dashboard(request: Request):
+    summary, chart_versions = _load_latest_summary()
+
+    return templates.TemplateResponse(
+        "dashboard.html",
+        {
+            "request": request,
+            "summary": summary,
+            "charts": list(chart_versions),
+            "chart_versions": chart_versions,
+        },
+    )
+
+
+@app.get("/upload", response_class=HTMLResponse)
+def upload_page(request: Request):
+    return templates.TemplateResponse("upload.html", {"request": request})
+
+
+@app.post("/upload", response_class=HTMLResponse)
+async def upload_file(request: Request):
+    # El cuerpo se escribe por bloques en un temporal: la memoria queda acotada
+    # al bloque y un archivo rechazado no pisa la versión previa
+    upload = await _receive_upload(request)
+    safe_name = upload.safe_name
     file_path = DATA_PATH / safe_name
+    partial_path = upload.partial_path
+
     # Sobrescribe el archivo si ya existía (evita fallar al reintentar)
-    with open(file_path, "wb") as f:
-        f.write(raw_bytes)
+    os.replace(partial_path, file_path)
+    # Un archivo nuevo puede cambiar qué extensión resuelve el nombre base, y
+    # los DataFrames en memoria de la versión anterior ya no se volverán a servir
+    data_load.clear_file_path_cache()
+    business_analysis.clear_inventory_cache()
 
     try:
-        df = data_load.load_data(file_path)
-        df = data_clean.data_clean(df)
-        data_analysis.analizar_inventario(df)
+        # Carga, limpieza y gráficos son CPU/IO bloqueantes: fuera del event loop
+        df = await run_in_threadpool(data_load.load_data, file_path)
+        df = await run_in_threadpool(data_clean.data_clean, df)
+        # Gráficos y análisis precalculados solo leen df: corren en paralelo
+        await asyncio.gather(
+            run_in_threadpool(data_analysis.analizar_inventario, df, verbose=False),
+            run_in_threadpool(_precompute_analyses, file_path, df),
+        )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"Error al procesar el archivo: {exc}")
 
-    charts = [p.name for p in REPORTS_PATH.glob("*.png")]
-
-    summary = {
-        "Total Productos": len(df),
-        "Categorías": df["categoria"].nunique(),
-        "Stock Promedio": round(df["cantidad"].mean(), 2),
-        "Valor Total": f"${df['valor_total'].sum():,.2f}",
-    }
+    charts = _scan_charts()
 
-    # Persistencia de últimos resultados
-    latest_run_path = REPORTS_PATH / "latest_run.txt"
-    with open(latest_run_path, "w", encoding="utf-8") as f:
-        f.write(str(charts))
+    summary = _build_summary(df)
 
-    latest_summary = summary
-    with open(REPORTS_PATH / "latest_summary.json", "w", encoding="utf-8") as f:
-        json.dump(latest_summary, f, ensure_ascii=False, indent=2)
+    await run_in_threadpool(_write_latest_summary, summary, charts)
 
     return templates.TemplateResponse(
         "results.html",
@@ -131,25 +632,36 @@ async def upload_file(request: Request, file: UploadFile):
 
 
 @app.get("/analysis/abc")
-def analysis_abc():
-    df = _load_clean_inventory()
-    return business_analysis.abc_classification(df)
+async def analysis_abc(request: Request):
+    return await _analysis_response(request, "abc", precomputed="abc", as_records=False)
 
 
 @app.get("/analysis/alerts")
-def analysis_alerts(top: int | None = Query(None, ge=1)):
+async def analysis_alerts(request: Request, top: int | None = Query(None, ge=1)):
     """
     Devuelve alertas priorizadas. Si no se especifica `top`, se devuelven todas las alertas.
     """
-    df = _load_clean_inventory()
-    return business_analysis.generar_alertas(df, top_n=top)
+    return await _analysis_response(
+        request,
+        "alerts",
+        precomputed="alerts" if top is None else None,
+        top_n=top,
+        as_records=False,
+    )
 
 
 @app.get("/analysis/what-if")
-def analysis_what_if(
+async def analysis_what_if(
+    request: Request,
     categoria: str = Query(..., min_length=1),
     porcentaje_reduccion: float = Query(..., gt=0),
     top_n: int | None = Query(None, gt=0, le=1000),
 ):
-    df = _load_clean_inventory()
-    return business_analysis.simular_what_if(df, categoria, porcentaje_reduccion, top_n=top_n)
+    return await _analysis_response(
+        request,
+        "what_if",
+        categoria=categoria,
+        porcentaje_reduccion=porcentaje_reduccion,
+        top_n=top_n,
+        as_records=False,
+    )